@@ -1,29 +1,105 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import MutableHeaders
 from starlette.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from app.routers import onboarding, search, chat
+from app.services import retriever
 
 load_dotenv()
-app = FastAPI(title="AI Legislation Bot")
+
+@asynccontextmanager
+async def lifespan(_api: FastAPI):
+    # load index/metadata/model before accepting traffic
+    await asyncio.to_thread(retriever.warmup)
+    yield
+
+api = FastAPI(title="AI Legislation Bot", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+_ALL_METHODS = (b"DELETE", b"GET", b"HEAD", b"OPTIONS", b"PATCH", b"POST", b"PUT")
+_PREFLIGHT_METHODS = b", ".join(_ALL_METHODS)
+
+class PermissiveCORS:
+    """
+    Pure-ASGI equivalent of CORSMiddleware(allow_origins=["*"], allow_credentials=True,
+    allow_methods=["*"], allow_headers=["*"]): same headers, without the per-request objects.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        origin = req_method = req_headers = None
+        has_cookie = False
+        for k, v in scope["headers"]:
+            if k == b"origin": origin = v
+            elif k == b"access-control-request-method": req_method = v
+            elif k == b"access-control-request-headers": req_headers = v
+            elif k == b"cookie": has_cookie = True
+        if origin is None:
+            return await self.app(scope, receive, send)
+
+        if scope["method"] == "OPTIONS" and req_method is not None:
+            body = b"OK" if req_method in _ALL_METHODS else b"Disallowed CORS method"
+            headers = [
+                (b"vary", b"Origin"),
+                (b"access-control-allow-methods", _PREFLIGHT_METHODS),
+                (b"access-control-max-age", b"600"),
+                (b"access-control-allow-credentials", b"true"),
+                (b"access-control-allow-origin", origin),
+            ]
+            if req_headers is not None:
+                headers.append((b"access-control-allow-headers", req_headers))
+            headers += [
+                (b"content-length", str(len(body)).encode()),
+                (b"content-type", b"text/plain; charset=utf-8"),
+            ]
+            status = 200 if body == b"OK" else 400
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                headers = MutableHeaders(scope=message)  # replaces, so route-set values aren't duplicated
+                headers["access-control-allow-origin"] = "*"
+                headers["access-control-allow-credentials"] = "true"
+                if has_cookie:
+                    # credentialed requests need the exact origin instead of '*'
+                    headers["access-control-allow-origin"] = origin.decode("latin-1")
+                    headers.add_vary_header("Origin")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 # keep permissive in dev; tighten for prod
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/health")
-def health():
-    return {"ok": True}
-
-app.include_router(onboarding.router, prefix="/onboarding", tags=["onboarding"])
-app.include_router(search.router, prefix="/search", tags=["search"])
-app.include_router(chat.router, prefix="/chat", tags=["chat"])
+api.add_middleware(PermissiveCORS)
+
+api.include_router(onboarding.router, prefix="/onboarding", tags=["onboarding"])
+api.include_router(search.router, prefix="/search", tags=["search"])
+api.include_router(chat.router, prefix="/chat", tags=["chat"])
 
 # serve the frontend
-app.mount("/", StaticFiles(directory="web", html=True), name="web")
+api.mount("/", StaticFiles(directory="web", html=True), name="web")
+
+_HEALTH_START = {
+    "type": "http.response.start",
+    "status": 200,
+    "headers": [(b"content-type", b"application/json"), (b"content-length", b"11")],
+}
+_HEALTH_BODY = {"type": "http.response.body", "body": b'{"ok":true}'}
+
+async def health_app(scope, receive, send):
+    await send(_HEALTH_START)
+    await send(_HEALTH_BODY)
+
+async def app(scope, receive, send):
+    # liveness probes skip FastAPI routing/middleware entirely
+    if scope["type"] == "http" and scope["path"] == "/health":
+        return await health_app(scope, receive, send)
+    return await api(scope, receive, send)
@@ -1,6 +1,6 @@
 # app/routers/chat.py
 from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from app.services.generator import answer, answer_stream
@@ -12,11 +12,11 @@ class ChatIn(BaseModel):
     message: str
 
 @router.post("")
-def chat(payload: ChatIn):
-    reply, sources = answer(payload.session_id, payload.message)
-    return JSONResponse({"reply": reply, "sources": sources})
+async def chat(payload: ChatIn):
+    reply, sources = await answer(payload.session_id, payload.message)
+    return ORJSONResponse({"reply": reply, "sources": sources})
 
 @router.get("/stream")
-def chat_stream(session_id: str = Query(...), q: str = Query(...)):
+async def chat_stream(session_id: str = Query(...), q: str = Query(...)):
     gen = answer_stream(session_id, q)
     return StreamingResponse(gen, media_type="text/plain")
@@ -1,17 +1,35 @@
 # app/services/generator.py
 from typing import List, Tuple
-import os, re, json
-from .retriever import knn, knn_state
-from .ranker import final_score
+from functools import lru_cache
+import os, re
+import asyncio
+import orjson
+import numpy as np
+from .retriever import search_batch, rows, row_features, context_line
+from .ranker import final_scores
 from .store import get_profile
 from .utils import safe_float, normalize_state
 from .llm_groq import complete as groq_complete
 from .llm_groq import complete_stream as groq_stream
+from .llm_groq import SPEED_MAP
 
 # ---------------- Persona & knobs ----------------
 
 STRICT_STATE = os.getenv("STRICT_STATE", "1") == "1"  # 1 = in-state only in results
+
+def _general_model() -> str:
+    # read per call: main.py runs load_dotenv() after this module is imported
+    return os.getenv("GROQ_MODEL_GENERAL", SPEED_MAP["instant"])  # small model is enough here
+
+def _policy_model() -> str:
+    # GROQ_MODEL_POLICY overrides (e.g. SPEED_MAP["fast70b"]); else the operator's GROQ_MODEL
+    return os.getenv("GROQ_MODEL_POLICY") or os.getenv("GROQ_MODEL", SPEED_MAP["balanced"])
+
 BANNED_PHRASES = [r"review( the)? bills?", r"monitor(ing)? updates", r"monitor legislative updates"]
+_BANNED_RE = re.compile("|".join(f"(?:{p})" for p in BANNED_PHRASES), re.I)
+_WS_NL_RE = re.compile(r"[ \t]+\n")
+_STEP_RE = re.compile(r"^(?:-|\d+\.)\s*(.+)$", re.M)
+_NEXT_STEPS_TAIL = re.compile(r"\n?\s*next steps:.*$", re.I | re.S)
 
 DEFAULT_STEPS = [
     "Inventory where automated tools influence decisions; document vendor, model, purpose, data, and human review.",
@@ -39,36 +57,47 @@ SYS_GENERAL = (
     "Answer in 4–6 short sentences unless the user asks for code or lists."
 )
 
+_SOURCES_PREFIX = b"\n||SOURCES||"
+_EMPTY_SOURCES_MARKER = _SOURCES_PREFIX + orjson.dumps({"sources": []})
+
 # ---------------- Helpers ----------------
 
 GREET_WORDS = {"hi", "hello", "hey", "hola", "yo", "sup", "how are you", "good morning", "good evening", "good afternoon"}
 GENERAL_HINT_WORDS = {"how", "what", "why", "explain", "help", "best", "tips", "difference", "compare", "write", "fix", "error"}
 LAW_HINT_WORDS = {"ai", "bill", "law", "act", "regulation", "hiring", "privacy", "biometric", "automated", "compliance", "audit"}
 
+def _any_word_re(words) -> re.Pattern:
+    # substring match for any of the words, in a single C-level scan
+    return re.compile("|".join(map(re.escape, sorted(words))))
+
+_GREET_PREFIXES = {w[:n] for w in GREET_WORDS for n in range(1, min(6, len(w)) + 1)}
+_GREET_RE = _any_word_re(GREET_WORDS)
+_GENERAL_HINT_RE = _any_word_re(GENERAL_HINT_WORDS)
+_LAW_HINT_RE = _any_word_re(LAW_HINT_WORDS)
+
 def _is_greeting(msg: str) -> bool:
     q = (msg or "").strip().lower()
     if not q:
         return False
-    # very short messages or classic greet words
-    return (len(q) <= 6 and any(q.startswith(w[: len(q)]) for w in GREET_WORDS)) or any(w in q for w in GREET_WORDS)
+    # very short messages that start a greet word, or classic greet words anywhere
+    return (len(q) <= 6 and q in _GREET_PREFIXES) or _GREET_RE.search(q) is not None
 
 def _looks_general(q: str) -> bool:
     ql = (q or "").lower()
     # treat as general if it lacks law-ish hints and contains generic help words
-    return (not any(w in ql for w in LAW_HINT_WORDS)) and any(w in ql for w in GENERAL_HINT_WORDS)
+    return _LAW_HINT_RE.search(ql) is None and _GENERAL_HINT_RE.search(ql) is not None
 
 def _postprocess_exec_style(text: str) -> str:
     # postprocess only for policy answers
     t = (text or "").strip()
     # remove banned phrases
-    for pat in BANNED_PHRASES:
-        t = re.sub(pat, "", t, flags=re.I)
+    t = _BANNED_RE.sub("", t)
     # normalize whitespace
-    t = re.sub(r"[ \t]+\n", "\n", t).strip()
+    t = _WS_NL_RE.sub("\n", t).strip()
     # enforce exactly two next steps
-    steps = re.findall(r"^(?:-|\d+\.)\s*(.+)$", t, flags=re.M)
+    steps = _STEP_RE.findall(t)
     if len(steps) != 2:
-        t = re.sub(r"(?is)\n?\s*next steps:.*$", "", t).strip()
+        t = _NEXT_STEPS_TAIL.sub("", t).strip()
         t += "\n\nNext steps:\n- " + DEFAULT_STEPS[0] + "\n- " + DEFAULT_STEPS[1]
     # ensure disclaimer
     if "Not legal advice" not in t:
@@ -84,43 +113,37 @@ def _augment_query(message: str, state: str) -> str:
     return f"{msg} in {state} {extra}".strip() if state else f"{msg} {extra}".strip()
 
 def _context_block(hits: List[dict]) -> str:
-    lines = []
-    for h in hits:
-        cats = (h.get("category") or "").replace(";", ", ")
-        cats = f" | categories: {cats}" if cats else ""
-        date = f" | date: {h.get('date')}" if h.get("date") else ""
-        url = f" | url: {h.get('url')}" if h.get("url") else ""
-        lines.append(
-            f"- {h.get('bill_id','')} | {h.get('title','')} | state: {h.get('state','')}{date}{cats}{url}\n  snippet: {h.get('snippet','')}"
-        )
-    return "\n".join(lines)
-
-def _suggest_examples(state: str, industry: str | None) -> List[str]:
+    # metadata part of each line is pre-formatted per row at load time
+    return "\n".join([f"{context_line(h['row_idx'])}\n  snippet: {h.get('snippet','')}" for h in hits])
+
+@lru_cache(maxsize=512)
+def _suggest_examples(state: str, industry: str | None) -> Tuple[str, ...]:
     st = state or "your state"
     ind = (industry or "your industry").lower()
-    return [
+    return (
         f"Do we need to disclose AI use to applicants in {st}?",
         f"Are bias audits required for automated hiring tools in {st}?",
         f"What counts as an automated employment decision tool in {st}?",
         f"Any bills touching AI use for {ind} companies in {st}?",
         f"When would penalties or private lawsuits apply in {st}?",
-    ]
+    )
+
+# you asked to be addressed as “sir”
+GREETING_TEMPLATE = "\n".join([
+    "hi sir — I’m your AI policy explainer.",
+    "I can summarize AI bills and explain what they mean for employers in {state}, in plain English.",
+    "ask me something specific, or try one of these:",
+    "- {q1}",
+    "- {q2}",
+    "- {q3}",
+    "or ask general work questions — I’m happy to help.",
+])
 
 def _greeting_reply(profile: dict) -> str:
     state = (profile.get("state") or "").strip() or "your state"
     industry = (profile.get("industry") or "").strip() or "your industry"
-    # you asked to be addressed as “sir”
-    examples = _suggest_examples(state, industry)
-    lines = [
-        "hi sir — I’m your AI policy explainer.",
-        f"I can summarize AI bills and explain what they mean for employers in {state}, in plain English.",
-        "ask me something specific, or try one of these:",
-        f"- {examples[0]}",
-        f"- {examples[1]}",
-        f"- {examples[2]}",
-        "or ask general work questions — I’m happy to help."
-    ]
-    return "\n".join(lines)
+    q1, q2, q3 = _suggest_examples(state, industry)[:3]
+    return GREETING_TEMPLATE.format(state=state, q1=q1, q2=q2, q3=q3)
 
 def _fallback_summary(profile: dict, query: str, hits: List[dict]) -> str:
     state = profile.get("state", "unspecified")
@@ -133,9 +156,36 @@ def _fallback_summary(profile: dict, query: str, hits: List[dict]) -> str:
         "Treat this as guidance, not legal advice."
     )
 
+async def _retrieve_top(query: str, user_state: str, profile: dict) -> List[dict]:
+    # In-state first, then global (FAISS releases the GIL, so keep it off the event loop)
+    (in_ids, in_sims), (g_ids, g_sims) = await asyncio.to_thread(search_batch, query, user_state, 20, 30)
+
+    # Merge de-duped by row (first occurrence wins, so in-state sims are kept)
+    ids, first = np.unique(np.concatenate([in_ids, g_ids]), return_index=True)
+    sims = np.concatenate([in_sims, g_sims])[first]
+
+    # Re-rank in one vectorized pass; dicts are only built for the final picks
+    is_hiring = any(k in (query or "").lower() for k in ["hiring", "employment", "aedt", "screening"])
+    preferred = set(profile.get("categories", [])) or ({"effect on labor/employment", "private sector use"} if is_hiring else set())
+    states, cat_match, recency = row_features(ids, preferred)
+    same_state = (states == user_state) if user_state else np.zeros(len(ids), dtype=bool)
+    scores = final_scores(sims, same_state, cat_match, recency)
+
+    order = np.argsort(-scores, kind="stable")
+    if user_state:
+        in_state, out_state = order[same_state[order]], order[~same_state[order]]
+        pick = in_state[:6] if STRICT_STATE else (np.concatenate([in_state[:4], out_state[:2]]) if len(in_state) else out_state[:6])
+    else:
+        pick = order[:6]
+
+    top = rows(ids[pick], sims[pick])
+    for h, sc in zip(top, scores[pick]):
+        h["score"] = safe_float(sc)
+    return top
+
 # ---------------- Main answer (non-stream) ----------------
 
-def answer(session_id: str, message: str) -> Tuple[str, List[dict]]:
+async def answer(session_id: str, message: str) -> Tuple[str, List[dict]]:
     profile = get_profile(session_id) or {}
     raw_state = (profile.get("state") or "").strip()
     user_state = normalize_state(raw_state)
@@ -150,43 +200,13 @@ def answer(session_id: str, message: str) -> Tuple[str, List[dict]]:
             {"role": "system", "content": SYS_GENERAL},
             {"role": "user", "content": message},
         ]
-        out = groq_complete(messages)
+        out = await groq_complete(messages, model=_general_model())
         return (out or "Happy to help, sir."), []
 
     # 3) Policy / retrieval path
     query = _augment_query(message, user_state) if message else message
 
-    # In-state first, then global
-    in_state_hits = knn_state(query, user_state, k=20) if user_state else []
-    global_hits = knn(query, k=30)
-
-    # Merge de-duped
-    def key(h): return (h.get("bill_id",""), h.get("state",""))
-    seen, merged = set(), []
-    for lst in (in_state_hits, global_hits):
-        for h in lst:
-            k = key(h)
-            if k not in seen:
-                seen.add(k); merged.append(h)
-
-    # Re-rank
-    rescored: List[dict] = []
-    for r in merged:
-        same_state = bool(user_state) and (normalize_state(r.get("state")) == user_state)
-        bill_cats = {c.strip().lower() for c in (r.get("category") or "").split(";") if c.strip()}
-        is_hiring = any(k in (query or "").lower() for k in ["hiring", "employment", "aedt", "screening"])
-        preferred = set(profile.get("categories", [])) or ({"effect on labor/employment", "private sector use"} if is_hiring else set())
-        cat_match = bool(preferred and (preferred & bill_cats))
-        score = final_score(r.get("sim", 0.0), same_state, cat_match, r.get("date", ""))
-        r2 = dict(r); r2["score"] = safe_float(score); rescored.append(r2)
-
-    rescored.sort(key=lambda x: x["score"], reverse=True)
-    if user_state:
-        in_state = [x for x in rescored if normalize_state(x.get("state")) == user_state]
-        out_state = [x for x in rescored if normalize_state(x.get("state")) != user_state]
-        top = in_state[:6] if STRICT_STATE else ((in_state[:4] + out_state[:2]) if in_state else out_state[:6])
-    else:
-        top = rescored[:6]
+    top = await _retrieve_top(query, user_state, profile)
 
     if user_state and STRICT_STATE and not top:
         return ("This state currently has no directly relevant items in our corpus. Ask to broaden the search if you want regional model bills.", [])
@@ -210,15 +230,15 @@ def answer(session_id: str, message: str) -> Tuple[str, List[dict]]:
             "- Finish with EXACTLY TWO concrete next steps (imperative verbs)."
         }
     ]
-    out = groq_complete(messages)
+    out = await groq_complete(messages, model=_policy_model())
     reply = _postprocess_exec_style(out) if out else _fallback_summary(profile, message, top)
     return reply, top
 
 # ---------------- Streaming answer ----------------
 
-def answer_stream(session_id: str, message: str):
+async def answer_stream(session_id: str, message: str):
     """
-    Streams the reply in chunks. Ends with a marker line:
+    Streams the reply in chunks (text as str, the marker as bytes). Ends with a marker line:
     \n||SOURCES||{"sources":[...]}
     """
     profile = get_profile(session_id) or {}
@@ -228,7 +248,7 @@ def answer_stream(session_id: str, message: str):
     # 1) Greeting shortcut (hand-crafted, no model)
     if _is_greeting(message):
         yield _greeting_reply(profile)
-        yield "\n||SOURCES||" + json.dumps({"sources": []})
+        yield _EMPTY_SOURCES_MARKER
         return
 
     # 2) General (non-legal) Q&A -> stream from model
@@ -237,51 +257,24 @@ def answer_stream(session_id: str, message: str):
             {"role": "system", "content": SYS_GENERAL},
             {"role": "user", "content": message},
         ]
-        for chunk in groq_stream(messages):
+        async for chunk in groq_stream(messages, model=_general_model()):
             if chunk:
                 yield chunk
-        yield "\n||SOURCES||" + json.dumps({"sources": []})
+        yield _EMPTY_SOURCES_MARKER
         return
 
     # 3) Policy / retrieval path
     query = _augment_query(message, user_state) if message else message
-    in_state_hits = knn_state(query, user_state, k=20) if user_state else []
-    global_hits = knn(query, k=30)
-
-    def key(h): return (h.get("bill_id",""), h.get("state",""))
-    seen, merged = set(), []
-    for lst in (in_state_hits, global_hits):
-        for h in lst:
-            k = key(h)
-            if k not in seen:
-                seen.add(k); merged.append(h)
-
-    rescored: List[dict] = []
-    for r in merged:
-        same_state = bool(user_state) and (normalize_state(r.get("state")) == user_state)
-        bill_cats = {c.strip().lower() for c in (r.get("category") or "").split(";") if c.strip()}
-        is_hiring = any(k in (query or "").lower() for k in ["hiring","employment","aedt","screening"])
-        preferred = set(profile.get("categories", [])) or ({"effect on labor/employment","private sector use"} if is_hiring else set())
-        cat_match = bool(preferred and (preferred & bill_cats))
-        score = final_score(r.get("sim", 0.0), same_state, cat_match, r.get("date", ""))
-        r2 = dict(r); r2["score"] = safe_float(score); rescored.append(r2)
-
-    rescored.sort(key=lambda x: x["score"], reverse=True)
-    if user_state:
-        in_state = [x for x in rescored if normalize_state(x.get("state")) == user_state]
-        out_state = [x for x in rescored if normalize_state(x.get("state")) != user_state]
-        top = in_state[:6] if STRICT_STATE else ((in_state[:4] + out_state[:2]) if in_state else out_state[:6])
-    else:
-        top = rescored[:6]
+    top = await _retrieve_top(query, user_state, profile)
 
     if user_state and STRICT_STATE and not top:
         yield "This state currently has no directly relevant items in our corpus. Ask to broaden the search if you want regional model bills."
-        yield "\n||SOURCES||" + json.dumps({"sources": []})
+        yield _EMPTY_SOURCES_MARKER
         return
 
     if not top:
         yield "I couldn’t find relevant items. Try adding your state or more context about the AI use (e.g., automated hiring bias audit)."
-        yield "\n||SOURCES||" + json.dumps({"sources": []})
+        yield _EMPTY_SOURCES_MARKER
         return
 
     ctx = _context_block(top)
@@ -300,8 +293,8 @@ def answer_stream(session_id: str, message: str):
         }
     ]
     # stream raw model text
-    for chunk in groq_stream(messages):
+    async for chunk in groq_stream(messages, model=_policy_model()):
         if chunk:
             yield chunk
     # final marker with sources
-    yield "\n||SOURCES||" + json.dumps({"sources": top})
+    yield _SOURCES_PREFIX + orjson.dumps({"sources": top})
@@ -1,17 +1,31 @@
 # app/services/llm_groq.py
 import os
-from groq import Groq
+import httpx
+from groq import AsyncGroq
 
-_client = None
-def _get_client():
-    global _client
-    if _client is None:
-        _client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-    return _client
+# Groq model tiers: 8B for chit-chat/general Q&A, 70B for policy explanations
+SPEED_MAP = {
+    "instant":  "llama-3.1-8b-instant",
+    "balanced": "llama-3.3-70b-versatile",
+    "fast70b":  "llama-3.3-70b-specdec",  # retired by Groq; only used if opted into via GROQ_MODEL_POLICY
+}
 
-def complete(messages, model=None, **kwargs) -> str:
+_aclient = None
+def _get_async_client():
+    global _aclient
+    if _aclient is None:
+        # one pooled HTTP/2 client for the process, so calls reuse warm TCP+TLS connections
+        http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=30.0),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+        _aclient = AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=1, http_client=http)
+    return _aclient
+
+async def complete(messages, model=None, **kwargs) -> str:
     model = model or os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
-    resp = _get_client().chat.completions.create(
+    resp = await _get_async_client().chat.completions.create(
         model=model, messages=messages,
         temperature=kwargs.get("temperature", 0.2),
         max_tokens=kwargs.get("max_tokens", 600),
@@ -20,19 +34,16 @@ def complete(messages, model=None, **kwargs) -> str:
     )
     return resp.choices[0].message.content or ""
 
-def complete_stream(messages, model=None, **kwargs):
-    from groq import Groq
-    import os
-    _client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+async def complete_stream(messages, model=None, **kwargs):
     model = model or os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
-    stream = _client.chat.completions.create(
+    stream = await _get_async_client().chat.completions.create(
         model=model, messages=messages,
         temperature=kwargs.get("temperature", 0.2),
         max_tokens=kwargs.get("max_tokens", 600),
         top_p=kwargs.get("top_p", 0.9),
         stream=True,
     )
-    for chunk in stream:
+    async for chunk in stream:
         delta = None
         if chunk.choices and hasattr(chunk.choices[0], "delta"):
             delta = chunk.choices[0].delta.content
@@ -1,7 +1,10 @@
 # app/services/ranker.py
 from datetime import datetime
+from functools import lru_cache
 import math
+import numpy as np
 
+@lru_cache(maxsize=4096)
 def recency_boost(date_str: str) -> float:
     if not date_str:
         return 0.0
@@ -21,3 +24,7 @@ def final_score(sim: float, same_state: bool, cat_match: bool, date_str: str) ->
         + 0.10 * (1.0 if cat_match else 0.0)
         + 0.05 * recency_boost(date_str)
     )
+
+def final_scores(sims: np.ndarray, same_state: np.ndarray, cat_match: np.ndarray, recency: np.ndarray) -> np.ndarray:
+    # vectorized final_score over aligned arrays
+    return 0.45 * sims + 0.40 * same_state + 0.10 * cat_match + 0.05 * recency
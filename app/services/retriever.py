@@ -1,39 +1,107 @@
 # app/services/retriever.py
 from pathlib import Path
+from collections import OrderedDict
+from threading import Lock
 import numpy as np
 import pandas as pd
 import faiss
 from fastembed import TextEmbedding
 from .utils import safe_float, as_str, normalize_state
+from .ranker import recency_boost
 
 ROOT   = Path(__file__).resolve().parents[2]
 DATA   = ROOT / "data" / "bills.csv"     # for snippets
 VEC_DIR= ROOT / "vector_store"
 INDEXP = VEC_DIR / "bills.faiss"
 METAP  = VEC_DIR / "meta.csv"
+VECP   = VEC_DIR / "bills_fp16.npy"  # optional, written by build_index.py
+BITSP  = VEC_DIR / "bills_bits.npy"  # optional, written by build_index.py
+EMBED_MODEL = "BAAI/bge-small-en-v1.5"  # also used by scripts/build_index.py and fetch_model.py
+QCACHE_SIZE = 1024  # recent query vectors kept in memory
 
 _EMBED = None
 _INDEX = None
 _META  = None
 _BILLS = None
 _DIM   = None
+_META_STATE = None  # normalized state code per row, for vectorized filtering
+_STATE_IDS  = None  # state code -> int64 row ids, for FAISS IDSelector search
+_META_RECENCY = None  # recency_boost per row, so ranking skips date parsing
+_META_CATS  = None  # bool matrix rows x categories (lowercased), for vectorized cat matching
+_CAT_COLS   = None  # category -> column in _META_CATS
+_META_FMT   = None  # pre-formatted context line per row (everything but the snippet)
+_META_COLS  = None  # column -> object array of cleaned strings, for per-hit lookups
+_BILLS_TEXT = None  # object array of bill text, row-aligned with _META
+_VECS16 = None      # fp16 embeddings for shortlist re-scoring
+_BITS   = None      # packed sign bits per row for the Hamming prefilter
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+_READY = False      # set once _load_all has populated everything
+_QCACHE: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+_QCACHE_LOCK = Lock()
 
 def _load_all():
-    global _EMBED, _INDEX, _META, _BILLS, _DIM
+    global _READY, _EMBED, _INDEX, _META, _BILLS, _DIM, _META_STATE, _STATE_IDS, _META_RECENCY
+    global _META_CATS, _CAT_COLS, _META_FMT, _META_COLS, _BILLS_TEXT, _VECS16, _BITS
     if _EMBED is None:
-        _EMBED = TextEmbedding("intfloat/e5-small-v2")
+        _EMBED = TextEmbedding(EMBED_MODEL)
     if _INDEX is None:
         _INDEX = faiss.read_index(str(INDEXP))
         _DIM = _INDEX.d  # query vector dimension
+        if VECP.exists() and BITSP.exists():
+            _VECS16 = np.load(VECP, mmap_mode="r")
+            _BITS = np.load(BITSP, mmap_mode="r")
+        elif isinstance(_INDEX, faiss.IndexHNSW):
+            # faiss 1.7.4 HNSW won't route through nodes an IDSelector rejects, so filtered
+            # searches come back short; decode the stored vectors to score states exactly
+            dec = _INDEX.reconstruct_n(0, _INDEX.ntotal)
+            _VECS16 = dec.astype(np.float16)
+            _BITS = np.packbits(dec > 0, axis=1)
     if _META is None:
         _META = pd.read_csv(METAP, dtype=str).fillna("")
+        _META_STATE = _META["state"].map(normalize_state).to_numpy()
+        _STATE_IDS = {
+            code: np.flatnonzero(_META_STATE == code).astype("int64")
+            for code in np.unique(_META_STATE) if code
+        }
+        _META_RECENCY = np.array([recency_boost(d) for d in _META["date"]], dtype="float32")
+        row_cats = [{c.strip().lower() for c in cats.split(";") if c.strip()} for cats in _META["category"]]
+        _CAT_COLS = {c: j for j, c in enumerate(sorted(set().union(*row_cats)))}
+        _META_CATS = np.zeros((len(_META), len(_CAT_COLS)), dtype=bool)
+        for i, cats in enumerate(row_cats):
+            _META_CATS[i, [_CAT_COLS[c] for c in cats]] = True
+        _META_FMT = [_format_row(r) for r in _META.itertuples(index=False)]
+        _META_COLS = {
+            c: (_META[c].map(as_str) if c in _META else pd.Series("", index=_META.index)).to_numpy(dtype=object)
+            for c in ("id", "title", "state", "category", "date", "url")
+        }
     if _BILLS is None:
         _BILLS = pd.read_csv(DATA, dtype=str).fillna("")
+        _BILLS_TEXT = _BILLS["text"].to_numpy(dtype=object)
+    # faiss ids are row positions into meta.csv and the sidecars; stale files would
+    # silently mislabel hits or score them from the wrong vectors
+    if _INDEX.ntotal != len(_META):
+        raise RuntimeError(f"{INDEXP} has {_INDEX.ntotal} vectors but {METAP} has {len(_META)} rows")
+    for path, arr in ((VECP, _VECS16), (BITSP, _BITS)):
+        if arr is not None and arr.shape[0] != _INDEX.ntotal:
+            raise RuntimeError(f"{INDEXP} has {_INDEX.ntotal} vectors but {path} has {arr.shape[0]} rows")
+    _READY = True
 
-def _norm(v: np.ndarray) -> np.ndarray:
-    v = v.astype("float32")
-    n = np.linalg.norm(v, axis=1, keepdims=True) + 1e-12
-    return v / n
+def warmup():
+    """Load everything and run one encode+search so the first real query is not the cold one."""
+    _load_all()
+    _search_with_mask(_encode_one("warmup"), None, 1)
+
+def _format_row(r) -> str:
+    date, cats, url = as_str(r.date), as_str(r.category).replace(";", ", "), as_str(r.url)
+    return "".join([
+        f"- {as_str(r.id)} | {as_str(r.title)} | state: {as_str(r.state)}",
+        f" | date: {date}" if date else "",
+        f" | categories: {cats}" if cats else "",
+        f" | url: {url}" if url else "",
+    ])
+
+def context_line(i: int) -> str:
+    return _META_FMT[i]
 
 def _snippet(text: str, max_chars: int = 600) -> str:
     s = " ".join(str(text or "").split())
@@ -43,42 +111,125 @@ def _snippet(text: str, max_chars: int = 600) -> str:
     return cut + "…"
 
 def _row_to_dict(i: int, sim):
-    row = _META.iloc[i]
-    text = _BILLS.iloc[i].get("text", "")
+    # plain array indexing; DataFrame.iloc builds a Series per call
     return {
-        "bill_id": as_str(row.get("id", "")),
-        "title":   as_str(row.get("title", "")),
-        "state":   as_str(row.get("state", "")),
-        "category":as_str(row.get("category", "")),
-        "date":    as_str(row.get("date", "")),
-        "url":     as_str(row.get("url", "")),
-        "snippet": _snippet(text),
+        "bill_id": _META_COLS["id"][i],
+        "title":   _META_COLS["title"][i],
+        "state":   _META_COLS["state"][i],
+        "category":_META_COLS["category"][i],
+        "date":    _META_COLS["date"][i],
+        "url":     _META_COLS["url"][i],
+        "snippet": _snippet(_BILLS_TEXT[i]),
         "sim":     safe_float(sim),
         "row_idx": int(i),
     }
 
 def _encode_one(text: str) -> np.ndarray:
-    v = np.array(list(_EMBED.embed([text], batch_size=1)), dtype="float32")
-    return _norm(v)
+    # repeat questions skip the model forward pass; keyed by model so a swap invalidates
+    key = (EMBED_MODEL, " ".join((text or "").split()).lower())
+    with _QCACHE_LOCK:
+        v = _QCACHE.get(key)
+        if v is not None:
+            _QCACHE.move_to_end(key)
+            return v
+    v = next(iter(_EMBED.embed([text], batch_size=1))).astype("float32", copy=False).reshape(1, -1)
+    faiss.normalize_L2(v)  # in place, one fused pass (same as build_index)
+    v.flags.writeable = False  # shared between callers
+    with _QCACHE_LOCK:
+        _QCACHE[key] = v
+        if len(_QCACHE) > QCACHE_SIZE:
+            _QCACHE.popitem(last=False)
+    return v
 
-def knn(query: str, k: int = 12):
-    _load_all()
-    qv = _encode_one(query)
-    scores, idxs = _INDEX.search(qv, k)
-    return [_row_to_dict(int(i), float(s)) for s, i in zip(scores[0], idxs[0])]
+EMPTY_HITS = (np.empty(0, dtype="int64"), np.empty(0, dtype="float32"))
 
-def knn_state(query: str, state: str, k: int = 12):
-    _load_all()
+def _rescore(qv: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    # fp16 dot products: the one sim source for every row once the sidecars are loaded
+    return np.einsum("ij,j->i", _VECS16[ids].astype(np.float32), qv[0])
+
+def _two_stage(qv: np.ndarray, ids: np.ndarray, k: int):
+    # coarse: Hamming distance on sign bits; fine: fp16 dot product on the shortlist
+    n_cand = min(len(ids), k * 8)
+    if n_cand < len(ids):
+        qbits = np.packbits(qv[0] > 0)
+        ham = _POPCOUNT[_BITS[ids] ^ qbits].sum(axis=1)
+        ids = ids[np.argpartition(ham, n_cand - 1)[:n_cand]]
+    sims = _rescore(qv, ids)
+    order = np.argsort(-sims)[:k]
+    return ids[order], sims[order]
+
+def _search_params(sel):
+    # IVF needs its own params type; keep the nprobe stored in the index
+    if isinstance(_INDEX, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=sel, nprobe=_INDEX.nprobe)
+    return faiss.SearchParameters(sel=sel)
+
+def _search_with_mask(qv: np.ndarray, code: str | None, k: int):
+    # code=None searches everything; otherwise only that state's rows are scored
+    if code is None:
+        scores, idxs = _INDEX.search(qv, k)
+        if _VECS16 is not None:
+            # SQ8 scores differ slightly from the fp16 ones the in-state path returns;
+            # re-score so a row's sim doesn't depend on which search found it
+            idxs = idxs[0][idxs[0] >= 0]
+            sims = _rescore(qv, idxs)
+            order = np.argsort(-sims, kind="stable")
+            return idxs[order], sims[order]
+    else:
+        ids = _STATE_IDS.get(code)
+        if ids is None:
+            return EMPTY_HITS
+        if _BITS is not None:
+            return _two_stage(qv, ids, k)
+        # IDSelectorBatch is a hash lookup per candidate
+        sel = faiss.IDSelectorBatch(ids)
+        scores, idxs = _INDEX.search(qv, min(k, len(ids)), params=_search_params(sel))
+    keep = idxs[0] >= 0
+    return idxs[0][keep], scores[0][keep]
+
+def knn_ids(query: str, k: int = 12):
+    """Global top-k as (row ids, sims) arrays."""
+    if not _READY: _load_all()
+    return _search_with_mask(_encode_one(query), None, k)
+
+def knn_state_ids(query: str, state: str, k: int = 12):
+    """In-state top-k as (row ids, sims) arrays."""
+    if not _READY: _load_all()
     code = normalize_state(state)
     if not code:
-        return []
-    # Search wider, then filter by state
+        return EMPTY_HITS
+    return _search_with_mask(_encode_one(query), code, k)
+
+def search_batch(query: str, state: str = "", k_state: int = 20, k_global: int = 30, widen: int = 50):
+    """
+    One embed and one global scan for both result sets: ((in-state ids, sims), (global ids, sims)).
+    In-state hits are taken from the widened global scan when it already holds the state's top k_state;
+    only otherwise is a separate in-state search run.
+    """
+    if not _READY: _load_all()
     qv = _encode_one(query)
-    widen = max(k * 10, 200)
-    scores, idxs = _INDEX.search(qv, min(widen, _INDEX.ntotal))
-    out = []
-    for s, i in zip(scores[0], idxs[0]):
-        if normalize_state(_META.iloc[int(i)].get("state", "")) == code:
-            out.append(_row_to_dict(int(i), float(s)))
-            if len(out) >= k: break
-    return out
+    g_ids, g_sims = _search_with_mask(qv, None, max(k_global, widen))
+    in_hits = EMPTY_HITS
+    code = normalize_state(state)
+    if code and code in _STATE_IDS:
+        mask = _META_STATE[g_ids] == code
+        if mask.sum() >= min(k_state, len(_STATE_IDS[code])):
+            in_hits = (g_ids[mask][:k_state], g_sims[mask][:k_state])
+        else:
+            in_hits = _search_with_mask(qv, code, k_state)
+    return in_hits, (g_ids[:k_global], g_sims[:k_global])
+
+def rows(idxs, sims) -> list:
+    return [_row_to_dict(int(i), float(s)) for i, s in zip(idxs, sims)]
+
+def row_features(idxs: np.ndarray, preferred: set):
+    """(state code, category match, recency) arrays for the given rows."""
+    cols = [_CAT_COLS[c] for c in preferred if c in _CAT_COLS]
+    cat_match = _META_CATS[idxs][:, cols].any(axis=1) if cols else np.zeros(len(idxs), dtype=bool)
+    return _META_STATE[idxs], cat_match, _META_RECENCY[idxs]
+
+def knn(query: str, k: int = 12):
+    return rows(*knn_ids(query, k))
+
+def knn_state(query: str, state: str, k: int = 12):
+    return rows(*knn_state_ids(query, state, k))
@@ -1,20 +1,42 @@
 # app/services/store.py
 import json
+import sqlite3
 import uuid
 from pathlib import Path
+from threading import Lock
 
-DB = Path(__file__).resolve().parents[2] / "data" / "sessions.json"
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+DB = DATA_DIR / "sessions.db"
+LEGACY_JSON = DATA_DIR / "sessions.json"  # imported once when the DB is first created
 DB.parent.mkdir(parents=True, exist_ok=True)
-if not DB.exists():
-    DB.write_text("{}", encoding="utf-8")
+
+def _connect() -> sqlite3.Connection:
+    fresh = not DB.exists()
+    conn = sqlite3.connect(DB, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS profiles (session_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+    if fresh and LEGACY_JSON.exists():
+        try:
+            legacy = json.loads(LEGACY_JSON.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            legacy = {}
+        conn.executemany(
+            "INSERT OR IGNORE INTO profiles VALUES (?, ?)",
+            [(sid, json.dumps(d, ensure_ascii=False)) for sid, d in legacy.items()],
+        )
+    return conn
+
+_CONN = _connect()
+_LOCK = Lock()
 
 def save_profile(data: dict) -> str:
     sid = str(uuid.uuid4())
-    all_ = json.loads(DB.read_text(encoding="utf-8"))
-    all_[sid] = data
-    DB.write_text(json.dumps(all_, ensure_ascii=False), encoding="utf-8")
+    with _LOCK:
+        _CONN.execute("INSERT INTO profiles VALUES (?, ?)", (sid, json.dumps(data, ensure_ascii=False)))
     return sid
 
 def get_profile(session_id: str) -> dict | None:
-    all_ = json.loads(DB.read_text(encoding="utf-8"))
-    return all_.get(session_id)
+    with _LOCK:
+        row = _CONN.execute("SELECT data FROM profiles WHERE session_id = ?", (session_id,)).fetchone()
+    return json.loads(row[0]) if row else None
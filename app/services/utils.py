@@ -1,5 +1,6 @@
 # app/services/utils.py
 import math
+from functools import lru_cache
 
 # app/services/utils.py (append)
 US_STATE_MAP = {
@@ -15,7 +16,12 @@ US_STATE_MAP = {
 }
 def normalize_state(s: str | None) -> str:
     if not s: return ""
-    s = str(s).strip()
+    return _normalize_state_cached(str(s))
+
+@lru_cache(maxsize=2048)
+def _normalize_state_cached(s: str) -> str:
+    # only ~52 distinct states, so repeat calls in ranking loops are dict hits
+    s = s.strip()
     if len(s) == 2 and s.isalpha():
         return s.upper()
     key = s.lower()
@@ -1,4 +1,6 @@
 # scripts/build_index.py
+import os
+import sys
 from pathlib import Path
 import numpy as np
 import pandas as pd
@@ -6,36 +8,101 @@ import faiss
 from fastembed import TextEmbedding
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from app.services.retriever import EMBED_MODEL  # noqa: E402  queries must be embedded by the same model
+
 DATA = ROOT / "data" / "bills.csv"
 VEC_DIR = ROOT / "vector_store"
 INDEX = VEC_DIR / "bills.faiss"
 META  = VEC_DIR / "meta.csv"
+VECS16 = VEC_DIR / "bills_fp16.npy"   # fp16 copy for re-scoring shortlists
+BITS   = VEC_DIR / "bills_bits.npy"   # packed sign bits for the Hamming prefilter
+BATCH_SIZE = 512
+MAX_CHARS = 4096  # well past the model's 512-token window; skip tokenizing the rest
+# HNSW graph over 8-bit scalar-quantized vectors: sub-linear search, ~4x smaller than fp32
+INDEX_SPEC = "HNSW32,SQ8"
+# Ids stay positional (faiss id i == meta.csv row i == sidecar row i): the retriever indexes
+# its numpy columns with them directly, and HNSW can't remove_ids, so an IDMap buys nothing
+EF_CONSTRUCTION = 200
+EF_SEARCH = 64  # stored in the index file; the retriever reads it back
+CHUNK_ROWS = 10_000  # bills embedded/added per pass; bounds peak memory
+META_COLS = ["id", "title", "state", "category", "date", "url"]
+CSV_DTYPES = {c: "string[pyarrow]" for c in META_COLS + ["text"]}
+# REUSE_VECS=1 rebuilds the index from the saved fp16 sidecar instead of re-embedding
+# (e.g. to try another INDEX_SPEC); bills.csv must be unchanged since that sidecar was written
+REUSE_VECS = os.getenv("REUSE_VECS", "0") == "1"
 
-def _norm(a):
-    n = np.linalg.norm(a, axis=1, keepdims=True) + 1e-12
-    return a / n
+def _take(stream, n: int) -> np.ndarray:
+    # write the next n vectors straight into one contiguous buffer (no list of per-doc arrays)
+    first = next(stream)
+    vecs = np.empty((n, first.shape[0]), dtype=np.float32)
+    vecs[0] = first
+    for i in range(1, n):
+        vecs[i] = next(stream)
+    faiss.normalize_L2(vecs)  # in place, SIMD
+    return vecs
 
 def main():
     assert DATA.exists(), f"Missing {DATA}"
     VEC_DIR.mkdir(parents=True, exist_ok=True)
 
-    df = pd.read_csv(DATA, dtype=str).fillna("")
-    texts = df["text"].astype(str).tolist()
+    if REUSE_VECS:
+        assert VECS16.exists(), f"REUSE_VECS=1 but {VECS16} is missing"
+        saved = np.load(VECS16, mmap_mode="r")
+    else:
+        emb = TextEmbedding(EMBED_MODEL)  # small quantized ONNX, no torch
+        # One embed() stream over the whole file: fastembed's worker pool (one single-threaded
+        # ONNX session per core) starts once instead of once per chunk
+        texts = pd.read_csv(
+            DATA, usecols=["text"], dtype=CSV_DTYPES,
+            na_filter=False, engine="c", chunksize=CHUNK_ROWS,
+        )
+        docs = (t for df in texts for t in df["text"].str.slice(0, MAX_CHARS))
+        stream = iter(emb.embed(docs, batch_size=BATCH_SIZE, parallel=0))  # 0 = one worker per core
+    reader = pd.read_csv(
+        DATA, usecols=META_COLS, dtype=CSV_DTYPES,
+        na_filter=False, engine="c", chunksize=CHUNK_ROWS,
+    )
+    index = None
+    vecs16, bits = [], []
+    n = 0
+    for ci, df in enumerate(reader):
+        if REUSE_VECS:
+            vecs = np.array(saved[n:n + len(df)], dtype=np.float32)
+            assert len(vecs) == len(df), f"{VECS16} has fewer rows than {DATA}; rebuild without REUSE_VECS"
+            faiss.normalize_L2(vecs)  # undo fp16 rounding drift
+        else:
+            vecs = _take(stream, len(df))
+        if index is None:
+            # quantizer ranges are trained on the first chunk
+            index = faiss.index_factory(vecs.shape[1], INDEX_SPEC, faiss.METRIC_INNER_PRODUCT)
+            if isinstance(index, faiss.IndexHNSW):
+                index.hnsw.efConstruction = EF_CONSTRUCTION
+            index.train(vecs)
+        index.add(vecs)
 
-    emb = TextEmbedding("intfloat/e5-small-v2")  # small, no torch
-    vecs = np.array(list(emb.embed(texts, batch_size=256)), dtype="float32")
-    vecs = _norm(vecs)
-    dim = vecs.shape[1]
+        # Sidecars for the retriever's two-stage in-state search
+        if not REUSE_VECS:
+            vecs16.append(vecs.astype(np.float16))
+            bits.append(np.packbits(vecs > 0, axis=1))
 
-    index = faiss.IndexFlatIP(dim)
-    index.add(vecs)
-    faiss.write_index(index, str(INDEX))
+        # Just the lightweight metadata you need at runtime
+        df[META_COLS].to_csv(META, mode="w" if ci == 0 else "a", header=ci == 0, index=False)
+        n += len(df)
 
-    # Just the lightweight metadata you need at runtime
-    meta = df[["id","title","state","category","date","url"]].copy()
-    meta.to_csv(META, index=False)
+    assert index is not None, f"No rows in {DATA}"
+    if REUSE_VECS:
+        assert n == len(saved), f"{VECS16} has more rows than {DATA}; rebuild without REUSE_VECS"
+    else:
+        assert next(stream, None) is None, "embedding stream out of step with meta rows"
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = EF_SEARCH
+    faiss.write_index(index, str(INDEX))
+    if not REUSE_VECS:  # reused sidecars are already on disk
+        np.save(VECS16, np.concatenate(vecs16))
+        np.save(BITS, np.concatenate(bits))
 
-    print(f"Built FAISS index {INDEX} with {len(df)} items, dim={dim}")
+    print(f"Built FAISS index {INDEX} with {n} items, dim={index.d}")
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,21 @@
 # scripts/enrich_categories.py
 """
 Heuristically fill/augment the `category` column in data/bills.csv.
-Writes back to the same CSV. Then re-run build_index.py to refresh meta.csv.
+Each regex rule in RULES is matched case-insensitively against title + text for every row
+at once; the tags of matching rules are unioned with the existing categories and written
+back sorted and semicolon-separated. Then re-run build_index.py to refresh meta.csv.
+If the optional `hyperscan` package is installed, all rules are matched in one scan per document.
 """
-import re
+import warnings
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+try:
+    import hyperscan  # optional: one DFA scan per document for all rules
+except ImportError:
+    hyperscan = None
+
 ROOT = Path(__file__).resolve().parents[1]
 CSV = ROOT / "data" / "bills.csv"
 
@@ -64,30 +73,57 @@ RULES = [
      {"Private Right of Action"}),
 ]
 
-def categorize(text: str) -> set[str]:
-    s = (text or "").lower()
-    cats: set[str] = set()
-    for pat, tags in RULES:
-        if re.search(pat, s):
-            cats |= tags
-    return cats
-
-def merge(existing: str, inferred: set[str]) -> str:
-    exist = {c.strip() for c in (existing or "").split(";") if c.strip()}
-    allcats = sorted(exist | inferred)
-    return ";".join(allcats)
+def _hs_database():
+    db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8
+    db.compile(
+        expressions=[pat.encode() for pat, _ in RULES],
+        ids=list(range(len(RULES))),
+        elements=len(RULES),
+        flags=[flags] * len(RULES),
+    )
+    return db
+
+def _rule_hits(blob: pd.Series) -> pd.DataFrame:
+    """Boolean frame, one column per rule (RULES order)."""
+    if hyperscan is not None:
+        db = _hs_database()
+        out = np.zeros((len(blob), len(RULES)), dtype=bool)
+        def on_match(rule_id, _start, _end, _flags, row):
+            out[row, rule_id] = True
+        for row, text in enumerate(blob):
+            db.scan(text.encode("utf-8"), match_event_handler=on_match, context=row)
+        return pd.DataFrame(out, index=blob.index)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", "This pattern is interpreted as a regular expression")
+        return pd.DataFrame(
+            # case=False keeps this on Arrow's regex kernel (no per-row Python re fallback)
+            {i: blob.str.contains(pat, case=False, regex=True).astype(bool) for i, (pat, _) in enumerate(RULES)},
+            index=blob.index,
+        )
+
+def categorize_frame(df: pd.DataFrame) -> pd.Series:
+    """New `category` column: existing categories plus tags of every matching rule."""
+    rule_hits = _rule_hits(df["title"] + " " + df["text"])
+    tag_hits: dict[str, pd.Series] = {}
+    for i, (_, tags) in enumerate(RULES):
+        for tag in tags:
+            tag_hits[tag] = tag_hits[tag] | rule_hits[i] if tag in tag_hits else rule_hits[i]
+
+    # long form (row -> tag) for existing + inferred, then one sorted join per row
+    existing = df["category"].str.split(";").explode().str.strip()
+    hits = pd.DataFrame(tag_hits, index=df.index)
+    inferred = hits.where(hits).stack().reset_index(level=1)["level_1"]
+    cats = pd.concat([existing[existing != ""], inferred]).astype(str)
+    cats = cats.rename_axis("row").reset_index(name="cat").drop_duplicates()
+    cats = cats.sort_values(["row", "cat"], kind="stable")
+    return cats.groupby("row")["cat"].agg(";".join).reindex(df.index, fill_value="")
 
 def main():
-    df = pd.read_csv(CSV, dtype=str).fillna("")
-    out = []
-    for _, r in df.iterrows():
-        blob = f"{r.get('title','')} {r.get('text','')}"
-        inferred = categorize(blob)
-        r["category"] = merge(r.get("category",""), inferred)
-        out.append(r)
-    newdf = pd.DataFrame(out)
-    newdf.to_csv(CSV, index=False)
-    print(f"Updated categories in {CSV}; rows: {len(newdf)}")
+    df = pd.read_csv(CSV, dtype="string[pyarrow]", na_filter=False, engine="c")
+    df["category"] = categorize_frame(df)
+    df.to_csv(CSV, index=False)
+    print(f"Updated categories in {CSV}; rows: {len(df)}")
 
 if __name__ == "__main__":
     main()
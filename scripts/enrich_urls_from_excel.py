@@ -1,40 +1,39 @@
 # scripts/enrich_urls_from_excel.py
 # Merge links from data/bill_urls.csv into data/bills.csv (overwrite bills.csv)
-import pandas as pd, re
+import numpy as np
+import pandas as pd
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 BILLS = ROOT / "data" / "bills.csv"
 URLS  = ROOT / "data" / "bill_urls.csv"   # put your Excel-extracted CSV here
 
-def norm_state(x: str) -> str:
-    return (x or "").strip().upper()
+def norm_state(col: pd.Series) -> pd.Series:
+    return col.fillna("").str.strip().str.upper()
 
-def base_bill(x: str) -> str:
+def base_bill(col: pd.Series) -> pd.Series:
     # normalize "S 1588", "H 890", "A 4030", etc. → "S1588", "H890", "A4030"
-    s = (x or "").upper().replace("—"," ").replace("-", " ")
-    m = re.search(r"\b([ASHEB]{1,2})\s*(\d{1,6})\b", s)  # A,S,H,SB,HB, etc.
-    if m:
-        return f"{m.group(1)}{m.group(2)}"
+    s = col.fillna("").str.upper().str.replace(r"[—-]", " ", regex=True)
+    ext = s.str.extract(r"\b([ASHEB]{1,2})\s*(\d{1,6})\b")  # A,S,H,SB,HB, etc.
     # fallback: strip spaces
-    return re.sub(r"\s+", "", s)
+    return (ext[0] + ext[1]).where(ext[0].notna(), s.str.replace(r"\s+", "", regex=True))
 
 def main():
     assert BILLS.exists(), f"missing {BILLS}"
     assert URLS.exists(),  f"missing {URLS}"
 
-    df = pd.read_csv(BILLS, dtype=str).fillna("")
-    linkmap = pd.read_csv(URLS, dtype=str).fillna("")
+    df = pd.read_csv(BILLS, dtype="string[pyarrow]", na_filter=False, engine="c")
+    linkmap = pd.read_csv(URLS, dtype="string[pyarrow]", na_filter=False, engine="c")
 
     # bills.csv uses id for bill number/title-ish; build join keys
-    df["state_key"] = df["state"].map(norm_state)
-    df["bill_key"]  = df["id"].map(base_bill)
+    df["state_key"] = norm_state(df["state"])
+    df["bill_key"]  = base_bill(df["id"])
 
     # Excel file has bill_id column; build join keys
     if "bill_id" not in linkmap.columns:
         raise SystemExit("bill_urls.csv must have a 'bill_id' column")
-    linkmap["state_key"] = linkmap["state"].map(norm_state) if "state" in linkmap.columns else ""
-    linkmap["bill_key"]  = linkmap["bill_id"].map(base_bill)
+    linkmap["state_key"] = norm_state(linkmap["state"]) if "state" in linkmap.columns else ""
+    linkmap["bill_key"]  = base_bill(linkmap["bill_id"])
 
     # Drop any empty keys to avoid bad joins
     linkmap = linkmap[(linkmap["bill_key"] != "") & (linkmap["state_key"] != "")]
@@ -47,11 +46,9 @@ def main():
     )
 
     # prefer existing url if present, else take Excel url
-    def pick(a, b): 
-        a = (a or "").strip(); b = (b or "").strip()
-        return a if a else b
-
-    merged["url"] = [pick(a, b) for a, b in zip(merged.get("url",""), merged.get("url_excel",""))]
+    a = merged["url"].fillna("").str.strip()
+    b = merged["url_excel"].fillna("").str.strip()
+    merged["url"] = np.where(a != "", a, b)
     merged = merged.drop(columns=["state_key","bill_key","url_excel"])
 
     merged.to_csv(BILLS, index=False)  # overwrite bills.csv so the rest of the pipeline picks it up
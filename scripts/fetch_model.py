@@ -1,8 +1,13 @@
 # scripts/fetch_model.py
+# Pre-download the ONNX embedder into fastembed's cache (FASTEMBED_CACHE_PATH) so
+# build_index.py and the first request don't fetch it; no torch involved.
 import os
-from sentence_transformers import SentenceTransformer
+import sys
+from pathlib import Path
+from fastembed import TextEmbedding
 
-target = os.environ.get("EMB_MODEL_LOCAL", "/app/models/all-MiniLM-L6-v2")
-os.makedirs(target, exist_ok=True)
-SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2").save(target)
-print("Saved model to", target)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.services.retriever import EMBED_MODEL  # noqa: E402
+
+TextEmbedding(EMBED_MODEL)
+print("Cached", EMBED_MODEL, "in", os.environ.get("FASTEMBED_CACHE_PATH", "fastembed's default cache dir"))
@@ -12,16 +12,25 @@ id,title,state,category,date,url,text,status
 - Includes bill status when present
 - Pulls best URL from common fields or nested link arrays
 - Works if JSON root is a list, {"records":[...]}, or JSONL (one JSON per line)
+- Streams list / {"records":[...]} roots record by record when ijson is installed
 """
 
 import json
-import csv
 import re
 import math
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
 from dateutil import parser as dtparser
 
+try:
+    import ijson  # optional: incremental parsing keeps one record in memory
+except ImportError:
+    ijson = None
+
 ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / "data" / "structured_aibills.json"
 OUT = ROOT / "data" / "bills.csv"
@@ -39,6 +48,8 @@ ID_KEYS = ["bill_id", "id", "bill_number", "number", "slug"]
 CATEGORY_KEYS = ["categories", "category", "tags", "labels"]
 STATUS_KEYS = ["status", "bill_status", "stage", "current_status"]
 
+OUT_COLS = ["id", "title", "state", "category", "date", "url", "text", "status"]
+
 CUT_TOKENS = ["Author:", "Version:", "Version Date:", "HOUSE", "SENATE", "ASSEMBLY", "STATE"]
 
 def clean_title_for_csv(bill_id: str, title: str) -> str:
@@ -75,10 +86,25 @@ def coalesce(d: Dict[str, Any], keys: List[str]) -> Optional[Any]:
             return d[k]
     return None
 
+# tried in order before falling back to dateutil; covers nearly all inputs
+DATE_FORMATS = ["%m/%d/%Y", "%Y-%m-%d", "%B %d, %Y"]
+
 def parse_date_any(v: Any) -> Optional[str]:
     if is_nan_like(v):
         return None
-    s = str(v)
+    return _parse_date_str(str(v).strip())
+
+@lru_cache(maxsize=50_000)
+def _parse_date_str(s: str) -> Optional[str]:
+    try:
+        return datetime.fromisoformat(s[:10]).date().isoformat()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            continue
     try:
         return dtparser.parse(s, fuzzy=True).date().isoformat()
     except Exception:
@@ -148,7 +174,34 @@ def best_url(rec: Dict[str, Any]) -> str:
                         return as_str(u2)
     return ""
 
+def _first_char(path: Path) -> bytes:
+    with path.open("rb") as f:
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                return ch
+
+def _stream_records(path: Path) -> Iterable[Dict[str, Any]]:
+    prefix = "item" if _first_char(path) == b"[" else "records.item"
+    with path.open("rb") as f:
+        for rec in ijson.items(f, prefix, use_float=True):
+            if isinstance(rec, dict):
+                yield rec
+
 def iter_records_from_source(path: Path) -> Iterable[Dict[str, Any]]:
+    if ijson is not None and _first_char(path) in (b"[", b"{"):
+        n = 0
+        try:
+            for rec in _stream_records(path):
+                n += 1
+                yield rec
+        except ijson.JSONError:
+            # JSONL trips the parser after its first object; retry below
+            if n:
+                raise
+        if n:
+            return
+        # single-object root or JSONL: fall through to the loaders below
     raw = path.read_text(encoding="utf-8", errors="ignore").strip()
     try:
         data = json.loads(raw)
@@ -183,9 +236,8 @@ def main():
     assert SRC.exists(), f"Missing input file: {SRC}"
     OUT.parent.mkdir(parents=True, exist_ok=True)
 
-    seen: Dict[Any, Dict[str, str]] = {}
+    recs: List[Dict[str, str]] = []
     count_in = 0
-    count_kept = 0
 
     for rec in iter_records_from_source(SRC):
         count_in += 1
@@ -207,55 +259,38 @@ def main():
         title = title_raw if title_raw and title_raw.lower() != "(untitled)" else title_fallback(bill_id, text)
         title = clean_title_for_csv(bill_id, title)
 
-        # Dedup key: prefer (bill_id, state); else (title.lower(), state, date)
-        if bill_id:
-            key = ("id", bill_id, state)
-        else:
-            key = ("ttl", title.lower(), state, date_iso)
-
-        prev = seen.get(key)
-        if prev is None:
-            seen[key] = {
-                "id": bill_id or f"{title[:40]}_{state}",
-                "title": title,
-                "state": state,
-                "category": category,
-                "date": date_iso,
-                "url": url,
-                "text": text,
-                "status": status,
-            }
-            count_kept += 1
-        else:
-            old_date = prev.get("date") or ""
-            if date_iso and (not old_date or date_iso > old_date):
-                prev.update({
-                    "id": bill_id or prev["id"],
-                    "title": title or prev["title"],
-                    "state": state or prev["state"],
-                    "category": category or prev["category"],
-                    "date": date_iso,
-                    "url": url or prev["url"],
-                    "text": text or prev["text"],
-                    "status": status or prev.get("status", ""),
-                })
-
-    rows = list(seen.values())
-
-    with OUT.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["id", "title", "state", "category", "date", "url", "text", "status"])
-        writer.writeheader()
-        for r in rows:
-            writer.writerow({
-                "id": r.get("id", ""),
-                "title": r.get("title", ""),
-                "state": r.get("state", ""),
-                "category": r.get("category", ""),
-                "date": r.get("date", ""),
-                "url": r.get("url", ""),
-                "text": r.get("text", ""),
-                "status": r.get("status", ""),
-            })
+        recs.append({
+            "bill_id": bill_id,
+            "id": bill_id or f"{title[:40]}_{state}",
+            "title": title,
+            "state": state,
+            "category": category,
+            "date": date_iso,
+            "url": url,
+            "text": text,
+            "status": status,
+        })
+
+    df = pd.DataFrame(recs, columns=["bill_id"] + OUT_COLS)
+    # Dedup key: prefer (bill_id, state); else (title.lower(), state, date)
+    df["key"] = np.where(
+        df["bill_id"] != "",
+        "id\x1f" + df["bill_id"] + "\x1f" + df["state"],
+        "ttl\x1f" + df["title"].str.lower() + "\x1f" + df["state"] + "\x1f" + df["date"],
+    )
+    df["order"] = df.groupby("key", sort=False).ngroup()  # first-seen order of each key
+    # A duplicate replaces the kept row only when its date is newer than every earlier
+    # one (blank dates rank lowest); drop the rest, then the last survivor per key wins.
+    rank = df["date"].rank(method="dense")
+    prior = rank.groupby(df["key"]).cummax().groupby(df["key"]).shift(fill_value=0)
+    df = df[rank > prior]
+    # blank title/category/url/status inherit from the row being replaced
+    fill = ["title", "category", "url", "status"]
+    df[fill] = df[fill].mask(df[fill] == "").groupby(df["key"]).ffill().fillna("")
+    rows = df.drop_duplicates("key", keep="last").sort_values("order")
+
+    # \r\n matches the csv module's default terminator, so the file is unchanged
+    rows[OUT_COLS].to_csv(OUT, index=False, encoding="utf-8", lineterminator="\r\n")
 
     print(f"Wrote {len(rows)} rows to {OUT} (from {count_in} input records)")
 